@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import wave
+import hashlib
+import numpy as np
+
+# 音频指纹索引：识别同一素材的不同转码/剪辑版本，复用已转写的字幕段
+# 指纹采用子带能量差分哈希（每帧 32 bit），全部基于 numpy 向量化计算
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_DIR = os.path.join(CURRENT_DIR, 'cache', 'audio_index')
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 2048          # 128 ms 窗口
+HOP_SIZE = 512             # 32 ms 帧移
+NUM_BANDS = 33             # 33 个子带 -> 32 bit 哈希
+BAND_LOW_HZ = 300
+BAND_HIGH_HZ = 2000
+SILENCE_RMS = 10 ** (-50 / 20)
+FFT_CHUNK_FRAMES = 4096    # 分块做 FFT，避免长音频一次性占用过多内存
+
+MAX_HASH_HITS = 16         # 出现次数过多的哈希（如持续单音）不参与投票
+MIN_OFFSET_VOTES = 20
+BER_WINDOW_FRAMES = 31     # 约 1 秒的误码率平滑窗口
+BER_THRESHOLD = 0.35       # 不相关音频的误码率约为 0.5
+MIN_MATCH_SECONDS = 10.0
+EDGE_SECONDS = 0.25        # 匹配区间边界的误差（BER 平滑窗口和帧窗口跨越剪辑点）
+MAX_ENTRIES = 100
+
+FRAME_SECONDS = HOP_SIZE / SAMPLE_RATE
+
+
+def load_pcm(wav_path):
+    """Read a 16 kHz mono 16-bit wav (as produced by the ffmpeg pre-processing) into float32"""
+    with wave.open(wav_path, 'rb') as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"Unexpected wav format in {wav_path}")
+        data = wf.readframes(wf.getnframes())
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def compute_fingerprint(pcm):
+    """
+    Compute per-frame 32-bit sub-band hashes for 16 kHz PCM.
+    Returns (hashes uint32, voiced bool mask), one entry per frame transition.
+    """
+    if len(pcm) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, FRAME_SIZE)[::HOP_SIZE]
+    n_frames = len(frames)
+
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / SAMPLE_RATE)
+    bin_edges = np.searchsorted(freqs, np.geomspace(BAND_LOW_HZ, BAND_HIGH_HZ, NUM_BANDS + 1))
+    lo, hi = bin_edges[0], bin_edges[-1]
+
+    energies = np.empty((n_frames, NUM_BANDS), dtype=np.float32)
+    rms = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, FFT_CHUNK_FRAMES):
+        chunk = frames[start:start + FFT_CHUNK_FRAMES]
+        rms[start:start + len(chunk)] = np.sqrt(np.mean(chunk * chunk, axis=1))
+        spectrum = np.abs(np.fft.rfft(chunk * window, axis=1)[:, lo:hi]) ** 2
+        energies[start:start + len(chunk)] = np.add.reduceat(spectrum, bin_edges[:-1] - lo, axis=1)
+
+    # bit = 相邻子带能量差在时间方向上的变化符号
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    hashes = np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel()
+    voiced = (rms[1:] >= SILENCE_RMS) & (rms[:-1] >= SILENCE_RMS)
+    return hashes.astype(np.uint32), voiced
+
+
+def _popcount32(values):
+    return np.unpackbits(values.astype('<u4').view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+
+
+def _vote_offset(query, query_voiced, ref):
+    """Find the ref-minus-query frame offset with the most exact hash hits"""
+    q_idx = np.nonzero(query_voiced)[0]
+    if len(q_idx) == 0 or len(ref) == 0:
+        return None, 0
+
+    order = np.argsort(ref, kind='stable')
+    sorted_ref = ref[order]
+    lo = np.searchsorted(sorted_ref, query[q_idx], side='left')
+    counts = np.searchsorted(sorted_ref, query[q_idx], side='right') - lo
+
+    keep = (counts > 0) & (counts <= MAX_HASH_HITS)
+    q_idx, lo, counts = q_idx[keep], lo[keep], counts[keep]
+    if len(q_idx) == 0:
+        return None, 0
+
+    # 展开每个查询帧命中的所有参考帧位置
+    total = int(counts.sum())
+    run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    ref_pos = order[np.repeat(lo, counts) + np.arange(total) - run_starts]
+    offsets = ref_pos - np.repeat(q_idx, counts) + len(query)
+
+    # 取原始票数最高的偏移；剪辑点未必对齐帧移，相邻偏移的票数只计入得分
+    votes = np.bincount(offsets)
+    best = int(np.argmax(votes))
+    score = int(votes[max(best - 1, 0):best + 2].sum())
+    return best - len(query), score
+
+
+def _longest_matched_run(query, query_voiced, ref, ref_voiced, offset):
+    """Return the longest (q_start, q_end) frame range that matches ref at the given offset"""
+    q_start = max(0, -offset)
+    q_end = min(len(query), len(ref) - offset)
+    if q_end - q_start < BER_WINDOW_FRAMES:
+        return None
+
+    errors = _popcount32(query[q_start:q_end] ^ ref[q_start + offset:q_end + offset])
+    ber = errors.astype(np.float32) / 32
+    # 两侧同为静音的帧视为匹配，避免静音噪声打断匹配区间
+    both_silent = ~query_voiced[q_start:q_end] & ~ref_voiced[q_start + offset:q_end + offset]
+    ber[both_silent] = 0.0
+
+    smoothed = np.convolve(ber, np.ones(BER_WINDOW_FRAMES) / BER_WINDOW_FRAMES, mode='same')
+    matched = np.concatenate(([0], (smoothed < BER_THRESHOLD).astype(np.int8), [0]))
+    edges = np.diff(matched)
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    if len(starts) == 0:
+        return None
+    longest = int(np.argmax(ends - starts))
+    return q_start + int(starts[longest]), q_start + int(ends[longest])
+
+
+def _has_voice(voiced, start, end):
+    """Whether any non-silent frame falls within [start, end) seconds"""
+    first = int(start / FRAME_SECONDS)
+    last = int(np.ceil(end / FRAME_SECONDS))
+    return bool(voiced[first:last].any())
+
+
+def _load_entries():
+    if not os.path.isdir(INDEX_DIR):
+        return
+    for name in os.listdir(INDEX_DIR):
+        if not name.endswith('.json'):
+            continue
+        key = name[:-len('.json')]
+        try:
+            with open(os.path.join(INDEX_DIR, name), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = np.load(os.path.join(INDEX_DIR, key + '.npz'))
+            yield meta, arrays['hashes'], arrays['voiced']
+        except Exception:
+            continue
+
+
+def _best_match(entries, phases, lo, hi, duration):
+    """Find the longest indexed run within the [lo, hi) seconds of the query"""
+    best = None
+    for meta, ref, ref_voiced in entries:
+        for phase, (hashes, voiced) in phases:
+            first = max(int(np.ceil((lo * SAMPLE_RATE - phase) / HOP_SIZE)), 0)
+            last = min(int((hi * SAMPLE_RATE - phase) // HOP_SIZE), len(hashes))
+            if last - first < BER_WINDOW_FRAMES:
+                continue
+            offset, votes = _vote_offset(hashes[first:last], voiced[first:last], ref)
+            if offset is None or votes < MIN_OFFSET_VOTES:
+                continue
+            offset -= first
+            run = _longest_matched_run(hashes[first:last], voiced[first:last], ref, ref_voiced, offset + first)
+            if not run:
+                continue
+            q_start, q_end = run[0] + first, run[1] + first
+            length = (q_end - q_start) * FRAME_SECONDS
+            if length < MIN_MATCH_SECONDS or (best is not None and length <= best["length"]):
+                continue
+            phase_seconds = phase / SAMPLE_RATE
+            best = {
+                "length": length,
+                "meta": meta,
+                "shift": offset * FRAME_SECONDS - phase_seconds,
+                # 匹配到指纹首尾时，文件首尾不足一帧的部分也算作匹配
+                "span_start": 0.0 if q_start == 0 else q_start * FRAME_SECONDS + phase_seconds,
+                "span_end": duration if q_end == len(hashes) else q_end * FRAME_SECONDS + phase_seconds
+            }
+    return best
+
+
+def find_match(pcm, model_id, requested_language, fingerprint=None):
+    """
+    Look up previously transcribed audio overlapping this 16 kHz PCM.
+    Only entries transcribed with the same model and requested language are considered.
+    fingerprint is compute_fingerprint(pcm) if already computed.
+    Returns None, or a dict with the reused segments (shifted to this file's timeline),
+    the novel spans that still need decoding, and the language of the longest matched source.
+    """
+    # 剪辑点未必对齐帧移，额外用错开半个帧移的指纹查询一次
+    phases = [(0, fingerprint or compute_fingerprint(pcm)), (HOP_SIZE // 2, compute_fingerprint(pcm[HOP_SIZE // 2:]))]
+    duration = len(pcm) / SAMPLE_RATE
+
+    # 换了模型或语言设置时需要重新转写，不能复用旧结果
+    entries = [
+        entry for entry in _load_entries()
+        if entry[0].get('model_id') == model_id and entry[0].get('requested_language') == requested_language
+    ]
+
+    # 先取最长的匹配，再在剩余未匹配的区间里继续查找（如中间插入了新内容，前后两段都能复用）
+    matches = []
+    pending = [(0.0, duration)]
+    while pending:
+        lo, hi = pending.pop()
+        if hi - lo < MIN_MATCH_SECONDS:
+            continue
+        match = _best_match(entries, phases, lo, hi, duration)
+        if match is None:
+            continue
+        match["span_start"] = max(match["span_start"], lo)
+        match["span_end"] = min(match["span_end"], hi)
+        matches.append(match)
+        pending += [(lo, match["span_start"]), (match["span_end"], hi)]
+    if not matches:
+        return None
+    matches.sort(key=lambda m: m["span_start"])
+
+    reused = []
+    covered = []
+    for index, match in enumerate(matches):
+        span_start, span_end, shift = match["span_start"], match["span_end"], match["shift"]
+        prev_end = matches[index - 1]["span_end"] if index > 0 else 0.0
+        next_start = matches[index + 1]["span_start"] if index + 1 < len(matches) else duration
+        # 未覆盖部分从匹配区间边界算起；与文件首尾或相邻匹配相接的边界之外，留出边界误差
+        head_end = span_start if span_start - prev_end <= FRAME_SECONDS else span_start + EDGE_SECONDS
+        tail_start = span_end if next_start - span_end <= FRAME_SECONDS else span_end - EDGE_SECONDS
+
+        # 只复用完整落在匹配区间内的字幕段；跨越区间边界的段丢弃，由未覆盖部分重新解码
+        segments = []
+        for seg in match["meta"]['segments']:
+            start = seg['start'] - shift
+            end = seg['end'] - shift
+            if start >= span_start - EDGE_SECONDS and end <= span_end + EDGE_SECONDS:
+                segments.append({"start": max(start, prev_end), "end": min(end, next_start), "text": seg['text']})
+            elif start < span_start < end:
+                head_end = max(head_end, end)
+            elif start < span_end < end:
+                tail_start = min(tail_start, start)
+        if segments:
+            head_end = min(head_end, segments[0]['start'])
+            tail_start = max(tail_start, segments[-1]['end'])
+        reused += segments
+        if tail_start > head_end:
+            covered.append((head_end, tail_start))
+    if not reused:
+        return None
+
+    # 匹配区间内没有字幕段的音乐、静音等不重复解码；未覆盖部分只要有声音就解码，不论长短
+    _, voiced = phases[0][1]
+    novel_spans = []
+    cursor = 0.0
+    for start, end in covered + [(duration, duration)]:
+        if start > cursor and _has_voice(voiced, cursor, start):
+            novel_spans.append((cursor, start))
+        cursor = max(cursor, end)
+
+    longest = max(matches, key=lambda m: m["length"])["meta"]
+    return {
+        "source": longest.get('source'),
+        "segments": reused,
+        "novel_spans": novel_spans,
+        "reused_seconds": sum(end - start for start, end in covered),
+        "language": longest.get('language'),
+        "language_probability": longest.get('language_probability')
+    }
+
+
+def add_entry(hashes, voiced, segments, language, language_probability, source, model_id, requested_language):
+    """Store a transcribed file's fingerprint, segments and transcription settings for later reuse"""
+    if len(hashes) == 0:
+        return
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    key = hashlib.sha1(hashes.tobytes()).hexdigest()
+
+    np.savez(os.path.join(INDEX_DIR, key + '.npz'), hashes=hashes, voiced=voiced)
+    meta = {
+        "source": source,
+        "created": time.time(),
+        "model_id": model_id,
+        "requested_language": requested_language,
+        "language": language,
+        "language_probability": language_probability,
+        "segments": [{"start": s['start'], "end": s['end'], "text": s['text']} for s in segments]
+    }
+    with open(os.path.join(INDEX_DIR, key + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    prune_entries()
+
+
+def prune_entries(max_entries=MAX_ENTRIES):
+    """Drop the oldest entries once the index grows beyond max_entries"""
+    metas = [n for n in os.listdir(INDEX_DIR) if n.endswith('.json')]
+    if len(metas) <= max_entries:
+        return
+    metas.sort(key=lambda n: os.path.getmtime(os.path.join(INDEX_DIR, n)))
+    for name in metas[:len(metas) - max_entries]:
+        key = name[:-len('.json')]
+        for path in (os.path.join(INDEX_DIR, name), os.path.join(INDEX_DIR, key + '.npz')):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
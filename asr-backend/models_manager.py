@@ -85,6 +85,9 @@ AVAILABLE_MODELS = [
     }
 ]
 
+# 可用于"草稿预览"的小模型，先快速出稿再由所选模型精修
+PREVIEW_MODEL_IDS = ["tiny", "base"]
+
 def get_model_path(model_id):
     """获取模型的本地路径，如果不存在则返回 None"""
     # faster-whisper 下载的模型通常在 models--systran--faster-whisper-xxx 目录下
@@ -112,6 +115,7 @@ def list_models():
         m['installed'] = path is not None
         m['path'] = path
         m['local_dir_exists'] = os.path.exists(model_dir)
+        m['preview'] = model['id'] in PREVIEW_MODEL_IDS
         results.append(m)
     return results
 
@@ -0,0 +1,160 @@
+import base64
+from array import array
+import numpy as np
+
+# 词级时间戳的列式存储与字幕重新切分
+# 长视频可能有几十万个词，按列存储（并行数组 + 文本偏移表）避免每个词一个 dict 的内存开销
+
+# 字幕切分默认限制：CJK 字符信息密度高，单条字数与语速上限更低
+DEFAULT_LIMITS = {
+    "default": {"max_chars": 42, "max_duration": 7.0, "max_cps": 17.0},
+    "cjk": {"max_chars": 20, "max_duration": 7.0, "max_cps": 9.0}
+}
+CJK_LANGUAGES = ["zh", "ja", "ko", "yue"]
+
+MAX_GAP_SECONDS = 1.0      # 词间停顿超过该值时强制断开
+SENTENCE_END = tuple(".?!。？！…")
+CLAUSE_END = tuple(",;:，；：、") + SENTENCE_END
+
+
+class WordTable:
+    """Columnar word storage: parallel start/end/prob arrays plus offsets into one text buffer"""
+
+    def __init__(self):
+        self.starts = array('f')
+        self.ends = array('f')
+        self.probs = array('f')
+        self.offsets = array('I', [0])
+        self._parts = []
+        self._text = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def append(self, start, end, text, prob=1.0):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.probs.append(prob)
+        self._parts.append(text)
+        self.offsets.append(self.offsets[-1] + len(text))
+        self._text = None
+
+    def append_segment(self, words, offset=0.0, convert=None):
+        """Append faster-whisper Word objects, returning the [first, last) index range"""
+        first = len(self)
+        for word in words:
+            text = convert(word.word) if convert else word.word
+            self.append(offset + word.start, offset + word.end, text, word.probability)
+        return first, len(self)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = ''.join(self._parts)
+            self._parts = [self._text]
+        return self._text
+
+    def word(self, index):
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def encode(self):
+        """Encode for IPC: little-endian float32/uint32 columns as base64 plus the text buffer"""
+        def b64(values, dtype):
+            return base64.b64encode(np.asarray(values, dtype=dtype).tobytes()).decode('ascii')
+        return {
+            "count": len(self),
+            "start": b64(self.starts, '<f4'),
+            "end": b64(self.ends, '<f4'),
+            "prob": b64(self.probs, '<f4'),
+            "offsets": b64(self.offsets, '<u4'),
+            "text": self.text
+        }
+
+
+def get_limits(language, max_chars=None, max_duration=None, max_cps=None):
+    """Resolve subtitle limits, filling unset values with per-language defaults"""
+    defaults = DEFAULT_LIMITS["cjk" if language in CJK_LANGUAGES else "default"]
+    return {
+        "max_chars": max_chars or defaults["max_chars"],
+        "max_duration": max_duration or defaults["max_duration"],
+        "max_cps": max_cps or defaults["max_cps"]
+    }
+
+
+def resegment(table, max_chars, max_duration, max_cps):
+    """
+    Split a word table into subtitle cues no longer than max_chars / max_duration.
+    Breaks prefer clause punctuation and long pauses; cues read faster than max_cps
+    are extended into the following gap where possible.
+    """
+    n = len(table)
+    if n == 0:
+        return []
+
+    starts = np.frombuffer(table.starts, dtype=np.float32).astype(np.float64)
+    ends = np.frombuffer(table.ends, dtype=np.float32).astype(np.float64)
+    offsets = np.frombuffer(table.offsets, dtype=np.uint32).astype(np.int64)
+    text = table.text
+    # 累计字数，O(1) 计算任意词区间的长度
+    cum_chars = offsets - offsets[0]
+
+    # 每个词最后一个字符的码点，向量化判断是否以标点结尾
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    last_chars = np.where(offsets[1:] > offsets[:-1], codes[np.maximum(offsets[1:] - 1, 0)] if len(codes) else 0, 0)
+    ends_clause = np.isin(last_chars, [ord(c) for c in CLAUSE_END])
+    ends_sentence = np.isin(last_chars, [ord(c) for c in SENTENCE_END])
+    gaps = np.append(starts[1:] - ends[:-1], 0.0)
+
+    breaks = []
+    cue_start = 0
+    last_clause = -1
+    for i in range(n):
+        if i > cue_start:
+            chars = cum_chars[i + 1] - cum_chars[cue_start]
+            too_long = chars > max_chars or ends[i] - starts[cue_start] > max_duration
+            if too_long:
+                # 优先在本条内最后一个标点处断开
+                if last_clause >= cue_start and cum_chars[last_clause + 1] - cum_chars[cue_start] >= max_chars / 2:
+                    cue_start = last_clause + 1
+                else:
+                    cue_start = i
+                breaks.append(cue_start)
+                last_clause = -1
+                for j in range(cue_start, i):
+                    if ends_clause[j]:
+                        last_clause = j
+
+        if ends_clause[i]:
+            last_clause = i
+        if i + 1 < n and (
+            gaps[i] > MAX_GAP_SECONDS
+            or (ends_sentence[i] and cum_chars[i + 1] - cum_chars[cue_start] >= max_chars / 3)
+        ):
+            cue_start = i + 1
+            breaks.append(cue_start)
+            last_clause = -1
+
+    first_words = np.array([0] + breaks, dtype=np.int64)
+    last_words = np.append(first_words[1:], n) - 1
+
+    cue_starts = starts[first_words]
+    cue_ends = ends[last_words]
+    cue_chars = cum_chars[last_words + 1] - cum_chars[first_words]
+
+    # 语速过快的字幕向后延长显示时间，但不超过下一条的开始和最大时长
+    next_starts = np.append(cue_starts[1:], np.inf)
+    min_ends = cue_starts + cue_chars / max_cps
+    cue_ends = np.maximum(cue_ends, np.minimum(min_ends, np.minimum(next_starts, cue_starts + max_duration)))
+
+    cues = []
+    for index in range(len(first_words)):
+        cue_text = text[offsets[first_words[index]]:offsets[last_words[index] + 1]].strip()
+        if not cue_text:
+            continue
+        cues.append({
+            "id": len(cues) + 1,
+            "start": float(cue_starts[index]),
+            "end": float(cue_ends[index]),
+            "text": cue_text
+        })
+    return cues
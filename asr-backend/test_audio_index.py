@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+import audio_index
+
+SR = audio_index.SAMPLE_RATE
+
+
+def speech_like(seconds, seed=0):
+    """Noise bursts shaped by a random, slowly changing spectral envelope"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * 10)
+    spectrum = np.fft.rfft(rng.standard_normal((frames, SR // 10)), axis=1)
+    spectrum *= np.repeat(rng.random((frames, 40)), spectrum.shape[1] // 40 + 1, axis=1)[:, :spectrum.shape[1]]
+    bursts = np.fft.irfft(spectrum, n=SR // 10, axis=1) * (rng.random((frames, 1)) > 0.2)
+    return (0.1 * bursts.ravel()).astype(np.float32)
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_index, "INDEX_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def source_entry(index_dir):
+    pcm = speech_like(120)
+    segments = [{"start": i * 5.0, "end": i * 5.0 + 4.0, "text": f" line {i}"} for i in range(24)]
+    audio_index.add_entry(*audio_index.compute_fingerprint(pcm), segments, "en", 0.9, "source.mp4", "small", "auto")
+    return pcm, segments
+
+
+def test_identical_audio_reuses_all_segments(source_entry):
+    pcm, segments = source_entry
+    match = audio_index.find_match(pcm, "small", "auto")
+
+    assert match is not None
+    assert match["source"] == "source.mp4"
+    assert [s["text"] for s in match["segments"]] == [s["text"] for s in segments]
+    assert match["segments"][0]["start"] == pytest.approx(0.0, abs=0.05)
+
+
+def test_trimmed_audio_reuses_shifted_segments(source_entry):
+    pcm, segments = source_entry
+    trimmed = pcm[30 * SR:]
+    match = audio_index.find_match(trimmed, "small", "auto")
+
+    assert match is not None
+    assert [s["text"] for s in match["segments"]] == [s["text"] for s in segments[6:]]
+    assert match["segments"][0]["start"] == pytest.approx(0.0, abs=0.05)
+    assert match["segments"][-1]["end"] == pytest.approx(89.0, abs=0.05)
+
+
+def test_matched_audio_without_segments_is_not_decoded(source_entry):
+    # the indexed file has no segment after 119 s; that tail is already known and must not be re-decoded
+    pcm, _ = source_entry
+    match = audio_index.find_match(pcm[15 * SR:], "small", "auto")
+
+    assert match is not None
+    assert match["novel_spans"] == []
+
+
+def test_insert_in_the_middle_reuses_both_halves(source_entry):
+    pcm, segments = source_entry
+    edited = np.concatenate([pcm[:60 * SR], speech_like(10, seed=4), pcm[60 * SR:]])
+    match = audio_index.find_match(edited, "small", "auto")
+
+    assert match is not None
+    assert [s["text"] for s in match["segments"]] == [s["text"] for s in segments]
+    assert match["segments"][12]["start"] == pytest.approx(70.0, abs=0.05)
+    assert len(match["novel_spans"]) == 1
+    start, end = match["novel_spans"][0]
+    assert 59.0 <= start <= 60.0 and end == pytest.approx(70.0, abs=0.05)
+
+
+def test_unrelated_audio_does_not_match(source_entry):
+    other = speech_like(60, seed=1)[::-1].copy()
+    assert audio_index.find_match(other, "small", "auto") is None
+
+
+def test_reencoded_audio_matches(source_entry):
+    pcm, segments = source_entry
+    rng = np.random.default_rng(2)
+    reencoded = (0.8 * pcm[10 * SR + 1234:] + 0.002 * rng.standard_normal(len(pcm) - 10 * SR - 1234)).astype(np.float32)
+    match = audio_index.find_match(reencoded, "small", "auto")
+
+    assert match is not None
+    assert len(match["segments"]) >= len(segments) - 3
+
+
+@pytest.mark.parametrize("model_id, language", [("large-v3", "auto"), ("small", "en")])
+def test_different_settings_do_not_reuse(source_entry, model_id, language):
+    pcm, _ = source_entry
+    assert audio_index.find_match(pcm, model_id, language) is None
+
+
+def test_short_uncovered_speech_is_decoded(source_entry):
+    pcm, _ = source_entry
+    intro = speech_like(1, seed=3)
+    with_intro = np.concatenate([intro, pcm])
+    match = audio_index.find_match(with_intro, "small", "auto")
+
+    assert match is not None
+    assert match["novel_spans"] and match["novel_spans"][0][0] == 0.0
+    assert match["novel_spans"][0][1] == pytest.approx(1.0, abs=0.05)
+
+
+def test_silent_uncovered_span_is_skipped(source_entry):
+    pcm, _ = source_entry
+    with_silence = np.concatenate([np.zeros(SR, dtype=np.float32), pcm])
+    match = audio_index.find_match(with_silence, "small", "auto")
+
+    assert match is not None
+    assert all(start > 0.0 for start, _ in match["novel_spans"])
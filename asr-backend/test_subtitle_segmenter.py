@@ -0,0 +1,81 @@
+import base64
+
+import numpy as np
+import pytest
+
+import subtitle_segmenter
+from subtitle_segmenter import WordTable, resegment
+
+
+def make_table(words):
+    table = WordTable()
+    for start, end, text in words:
+        table.append(start, end, text)
+    return table
+
+
+def evenly_spaced(texts, start=0.0, step=0.4):
+    return [(start + i * step, start + i * step + step * 0.8, text) for i, text in enumerate(texts)]
+
+
+def test_cues_stay_within_limits():
+    texts = [f" word{i}" for i in range(60)]
+    cues = resegment(make_table(evenly_spaced(texts)), max_chars=20, max_duration=3.0, max_cps=17.0)
+
+    assert len(cues) > 1
+    assert all(len(cue["text"]) <= 20 for cue in cues)
+    assert all(cue["end"] - cue["start"] <= 3.0 + 1e-6 for cue in cues)
+    assert " ".join(cue["text"] for cue in cues) == "".join(texts).strip()
+    assert [cue["id"] for cue in cues] == list(range(1, len(cues) + 1))
+
+
+def test_breaks_prefer_clause_punctuation():
+    texts = [" one", " two", " three,", " four", " five", " six", " seven"]
+    cues = resegment(make_table(evenly_spaced(texts)), max_chars=24, max_duration=7.0, max_cps=17.0)
+
+    assert [cue["text"] for cue in cues] == ["one two three,", "four five six seven"]
+
+
+def test_breaks_at_long_pauses():
+    gap = subtitle_segmenter.MAX_GAP_SECONDS + 0.5
+    words = [(0.0, 0.4, " hello"), (0.5, 0.9, " there"), (0.9 + gap, 1.3 + gap, " again")]
+    cues = resegment(make_table(words), max_chars=42, max_duration=7.0, max_cps=17.0)
+
+    assert [cue["text"] for cue in cues] == ["hello there", "again"]
+
+
+def test_cps_extension_stops_at_next_cue():
+    words = [(0.0, 0.5, " abcdefghijklmnopqrstu"), (1.6, 2.0, " next")]
+    cues = resegment(make_table(words), max_chars=42, max_duration=7.0, max_cps=10.0)
+
+    # 21 chars at 10 CPS would need 2.1 s, but the next cue starts at 1.6 s
+    assert cues[0]["end"] == pytest.approx(1.6)
+    assert cues[1]["start"] == pytest.approx(1.6)
+
+
+def test_segment_without_word_timestamps_passes_through():
+    text = " a whole segment without word timestamps, longer than the limits"
+    words = evenly_spaced([" before", " it"]) + [(2.0, 12.0, text)] + evenly_spaced([" after"], start=12.5)
+    cues = resegment(make_table(words), max_chars=20, max_duration=7.0, max_cps=17.0)
+
+    long_cue = next(cue for cue in cues if cue["text"] == text.strip())
+    assert long_cue["start"] == pytest.approx(2.0)
+    assert long_cue["end"] == pytest.approx(12.0)
+
+
+def test_encode_round_trip():
+    words = [(0.25, 0.75, " hello", 0.9), (1.0, 1.5, " 世界", 0.5)]
+    table = WordTable()
+    for start, end, text, prob in words:
+        table.append(start, end, text, prob)
+    encoded = table.encode()
+
+    def decode(key, dtype):
+        return np.frombuffer(base64.b64decode(encoded[key]), dtype=dtype)
+
+    assert encoded["count"] == 2
+    np.testing.assert_allclose(decode("start", "<f4"), [0.25, 1.0])
+    np.testing.assert_allclose(decode("end", "<f4"), [0.75, 1.5])
+    np.testing.assert_allclose(decode("prob", "<f4"), [0.9, 0.5], rtol=1e-6)
+    offsets = decode("offsets", "<u4")
+    assert [encoded["text"][offsets[i]:offsets[i + 1]] for i in range(2)] == [" hello", " 世界"]
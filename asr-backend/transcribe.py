@@ -6,9 +6,14 @@ import traceback
 import time
 import shutil
 import warnings
+import collections
+import types
 import ffmpeg
+import numpy as np
 from faster_whisper import WhisperModel
 import models_manager
+import audio_index
+import subtitle_segmenter
 import opencc
 
 # Suppress HuggingFace Hub warnings about symlinks
@@ -101,22 +106,259 @@ def get_media_duration(file_path):
         # 如果获取失败，就不显示进度百分比了
         return None
 
-def main():
+def ensure_model_path(model_id):
+    """Return the local path of a model, downloading it first if needed"""
+    model_path = models_manager.get_model_path(model_id)
+    if not model_path:
+        # 尝试自动下载
+        log_info(f"Model not found locally, downloading {model_id}...")
+        # Send progress event to UI
+        ipc_send("progress", {"stage": "downloading_model", "model": model_id})
+        try:
+            model_path = models_manager.download_model_by_id(model_id)
+        except Exception as e:
+            print(json.dumps({"error": f"Failed to download model: {str(e)}"}, ensure_ascii=False))
+            sys.exit(1)
+    return model_path
+
+# 预热进程加载好的模型，后续任务在同一进程中直接取用
+_warm_models = {}
+
+def load_whisper_model(model_path, device):
+    """Load a WhisperModel on the requested device, falling back to CPU"""
+    warm_model = _warm_models.pop((model_path, device), None)
+    if warm_model is not None:
+        log_info(f"Using pre-warmed model from {model_path}")
+        return warm_model
+
+    # DEBUG: Print model loading params
+    log_info(f"Loading WhisperModel from {model_path}")
+    
+    try:
+        # 尝试使用用户指定的设备
+        requested_device = device
+        log_info(f"Requested device={requested_device}")
+
+        if requested_device == "cuda":
+            # 用户强制请求 CUDA
+            try:
+                # 尝试加载，如果失败则捕获详细信息
+                log_info("Attempting to load model on CUDA...")
+                model = WhisperModel(model_path, device="cuda", compute_type="int8")
+            except Exception as e:
+                error_str = str(e)
+                log_info(f"CUDA load failed: {error_str}")
+                
+                if "cublas" in error_str.lower() or "cudnn" in error_str.lower():
+                     log_info("Missing CUDA/cuDNN libraries. Please install cuDNN 8.x for CUDA 11/12.")
+                
+                log_info("Falling back to CPU...")
+                model = WhisperModel(model_path, device="cpu", compute_type="int8")
+        elif requested_device == "auto":
+             # 自动尝试
+             try:
+                model = WhisperModel(model_path, device="auto", compute_type="int8")
+             except Exception as e:
+                log_info(f"Auto device failed ({e}), falling back to CPU")
+                model = WhisperModel(model_path, device="cpu", compute_type="int8")
+        else:
+             # 默认 CPU
+             model = WhisperModel(model_path, device="cpu", compute_type="int8")
+         
+    except Exception as e_cpu:
+         log_info(f"'cpu' device failed ({e_cpu}), trying auto")
+         model = WhisperModel(model_path, device="auto", compute_type="int8")
+    return model
+
+def transcribe_segments(model, audio, language, initial_prompt, duration, draft=False, reuse=None, words=None):
+    """
+    Start a transcription and return (info, iterator of (seg_data, progress)).
+    draft=True uses greedy decoding for a fast preview pass.
+    reuse is a match from audio_index.find_match; audio must then be the 16 kHz PCM array,
+    and only the novel spans are decoded while matched segments are emitted as-is.
+    reuse is not combined with words, since indexed segments carry no word timestamps.
+    words is an optional subtitle_segmenter.WordTable that collects word-level timestamps;
+    each seg_data then carries the [first, last) "word_range" into it.
+    """
+    if draft:
+        decode_options = {"beam_size": 1, "best_of": 1, "temperature": 0.0}
+    else:
+        decode_options = {
+            "beam_size": 5,
+            "best_of": 5,
+            "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+        }
+    if words is not None:
+        decode_options["word_timestamps"] = True
+
+    def decode(audio_input, decode_language):
+        return model.transcribe(
+            audio_input, 
+            language=None if decode_language == "auto" else decode_language,
+            vad_filter=False, 
+            condition_on_previous_text=False, 
+            initial_prompt=initial_prompt,
+            **decode_options
+        )
+
+    if reuse is None:
+        segments_generator, info = decode(audio, language)
+        pieces = [("segments", 0.0, segments_generator)]
+    else:
+        # 复用已转写的片段，只解码新增部分；语言沿用原文件的识别结果
+        if language == "auto" and reuse["language"]:
+            language = reuse["language"]
+        info = types.SimpleNamespace(
+            language=language,
+            language_probability=reuse["language_probability"],
+            duration=len(audio) / audio_index.SAMPLE_RATE
+        )
+        pieces = [("decode", start, end) for start, end in reuse["novel_spans"]]
+        pieces += [("reuse", seg["start"], seg) for seg in reuse["segments"]]
+        pieces.sort(key=lambda piece: piece[1])
+
+    cc = None
+    if info.language == "zh":
+         try:
+             cc = opencc.OpenCC('t2s')
+         except Exception as e:
+             log_info(f"OpenCC init failed: {e}")
+
+    def iter_segments():
+        next_id = 1
+        for kind, offset, data in pieces:
+            if kind == "reuse":
+                # 复用段的文本已经过繁简转换
+                segments = [(data["start"], data["end"], data["text"], None)]
+            else:
+                if kind == "decode":
+                    span = audio[int(offset * audio_index.SAMPLE_RATE):int(data * audio_index.SAMPLE_RATE)]
+                    data, _ = decode(span, language)
+                segments = (
+                    (offset + segment.start, offset + segment.end, cc.convert(segment.text) if cc else segment.text, segment.words)
+                    for segment in data
+                )
+
+            for start, end, text, segment_words in segments:
+                # 发送进度
+                progress = 0.0
+                if duration and duration > 0:
+                    progress = min(end / duration, 1.0)
+
+                seg_data = {
+                    "id": next_id,
+                    "start": start,
+                    "end": end,
+                    "text": text
+                }
+                if draft:
+                    seg_data["draft"] = True
+                if words is not None:
+                    if segment_words:
+                        word_range = words.append_segment(segment_words, offset, cc.convert if cc else None)
+                    else:
+                        # 没有词级时间戳的段，整段作为一个"词"参与切分
+                        words.append(start, end, text)
+                        word_range = (len(words) - 1, len(words))
+                    seg_data["word_range"] = list(word_range)
+                next_id += 1
+                yield seg_data, progress
+
+    return info, iter_segments()
+
+def pop_replaced_drafts(pending_drafts, refined_end):
+    """Pop draft segments whose midpoint falls before the end of a refined segment"""
+    replaced = []
+    while pending_drafts:
+        draft = pending_drafts[0]
+        if (draft["start"] + draft["end"]) / 2 > refined_end:
+            break
+        replaced.append(pending_drafts.popleft()["id"])
+    return replaced
+
+def page_in_model(model_path, chunk_size=16 * 1024 * 1024):
+    """Read model.bin sequentially so its pages sit in the OS file cache before loading"""
+    model_file = os.path.join(model_path, "model.bin")
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    total = 0
+    with open(model_file, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(view)
+            if not n:
+                break
+            total += n
+    return total
+
+def warmup_model(model_id, device):
+    """
+    Load a model ahead of the first job: page in the weights, create the model
+    (CTranslate2 allocation / CUDA context) and run a one-second dummy decode.
+    The warm model is kept in _warm_models for the next job in this process.
+    """
+    model_path = models_manager.get_model_path(model_id)
+    if not model_path:
+        # 预热不触发下载，未安装的模型留到正式任务时再处理
+        ipc_send("warmup", {"state": "skipped", "model_id": model_id, "reason": "Model not installed"})
+        return False
+
+    timings = {}
+    ipc_send("warmup", {"state": "paging", "model_id": model_id})
+    started = time.time()
+    bytes_read = page_in_model(model_path)
+    timings["page_in_seconds"] = time.time() - started
+
+    ipc_send("warmup", {"state": "loading", "model_id": model_id})
+    started = time.time()
+    model = load_whisper_model(model_path, device)
+    timings["load_seconds"] = time.time() - started
+
+    ipc_send("warmup", {"state": "decoding", "model_id": model_id})
+    started = time.time()
+    segments, _ = model.transcribe(
+        np.zeros(audio_index.SAMPLE_RATE, dtype=np.float32),
+        beam_size=1,
+        vad_filter=False,
+        condition_on_previous_text=False
+    )
+    for _ in segments:
+        pass
+    timings["decode_seconds"] = time.time() - started
+
+    _warm_models[(model_path, device)] = model
+    ipc_send("warmup", {
+        "state": "ready",
+        "model_id": model_id,
+        "device": getattr(model.model, "device", device),
+        "bytes": bytes_read,
+        **timings
+    })
+    log_info(f"Model {model_id} warmed up: {timings}")
+    return True
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Local Subtitle ASR Tool CLI")
     
     # 模式选择
     parser.add_argument("--list-models", action="store_true", help="List available models")
     parser.add_argument("--download-model", action="store_true", help="Download a specific model")
+    parser.add_argument("--warmup", action="store_true", help="Pre-load a model, then wait for a job (JSON argv list) on stdin")
     
     # 识别参数
     parser.add_argument("--input", type=str, help="Input video/audio file path")
     parser.add_argument("--model-id", type=str, default="tiny", help="Model ID to use")
+    parser.add_argument("--preview-model-id", type=str, default=None, help="Small model ID for a quick draft pass before refining with --model-id")
+    parser.add_argument("--reuse-audio", action="store_true", help="Reuse segments from previously transcribed files with overlapping audio")
+    parser.add_argument("--word-timestamps", action="store_true", help="Collect word-level timestamps and re-split subtitles by the limits below")
+    parser.add_argument("--max-chars", type=int, default=None, help="Max characters per subtitle (default depends on language)")
+    parser.add_argument("--max-duration", type=float, default=None, help="Max seconds per subtitle")
+    parser.add_argument("--max-cps", type=float, default=None, help="Max reading speed in characters per second")
     parser.add_argument("--language", type=str, default="auto", help="Language code (e.g. zh, en) or auto")
     parser.add_argument("--device", type=str, default="cpu", choices=["cpu", "cuda", "auto"], help="Device to use (cpu, cuda, auto)")
     parser.add_argument("--output-format", type=str, default="json", choices=["json"], help="Output format")
     
     # 解析参数
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 1. 列出模型
     if args.list_models:
@@ -144,7 +386,21 @@ def main():
             sys.exit(1)
         return
 
-    # 3. 执行识别
+    # 3. 预热模型，然后等待 stdin 传入第一个任务的参数
+    if args.warmup:
+        try:
+            if not warmup_model(args.model_id, args.device):
+                # 未安装的模型不会被交接任务，直接退出
+                return
+        except Exception as e:
+            # 任务可能已在预热过程中交接过来，预热失败时仍执行任务，模型按正常流程加载
+            ipc_send("warmup", {"state": "error", "model_id": args.model_id, "error": str(e)})
+        job = sys.stdin.readline()
+        if not job.strip():
+            return
+        return main(json.loads(job))
+
+    # 4. 执行识别
     if not args.input:
         print(json.dumps({"error": "Input file is required"}, ensure_ascii=False))
         sys.exit(1)
@@ -156,75 +412,22 @@ def main():
         print(json.dumps({"error": f"Input file not found: {args.input}"}, ensure_ascii=False))
         sys.exit(1)
 
+    # 草稿模式：先用小模型快速出稿，再用 --model-id 精修
+    preview_model_id = args.preview_model_id
+    if preview_model_id == args.model_id:
+        preview_model_id = None
+    if preview_model_id and preview_model_id not in models_manager.PREVIEW_MODEL_IDS:
+        print(json.dumps({"error": f"Model {preview_model_id} cannot be used for draft preview"}, ensure_ascii=False))
+        sys.exit(1)
+
     # 检查模型是否就绪
-    model_path = models_manager.get_model_path(args.model_id)
-    if not model_path:
-        # 尝试自动下载
-        log_info(f"Model not found locally, downloading {args.model_id}...")
-        # Send progress event to UI
-        ipc_send("progress", {"stage": "downloading_model", "model": args.model_id})
-        try:
-            model_path = models_manager.download_model_by_id(args.model_id)
-        except Exception as e:
-            print(json.dumps({"error": f"Failed to download model: {str(e)}"}, ensure_ascii=False))
-            sys.exit(1)
+    model_path = ensure_model_path(preview_model_id or args.model_id)
 
     # 获取时长用于进度计算
     duration = get_media_duration(args.input)
     if duration:
         log_info(f"Media duration: {duration:.2f}s")
 
-    # 加载模型
-    log_info("Loading model...")
-    ipc_send("progress", {"stage": "loading_model"})
-    
-    try:
-        # DEBUG: Print model loading params
-        log_info(f"Loading WhisperModel from {model_path}")
-        
-        try:
-            # 尝试使用用户指定的设备
-            requested_device = args.device
-            log_info(f"Requested device={requested_device}")
-
-            if requested_device == "cuda":
-                # 用户强制请求 CUDA
-                try:
-                    # 尝试加载，如果失败则捕获详细信息
-                    log_info("Attempting to load model on CUDA...")
-                    model = WhisperModel(model_path, device="cuda", compute_type="int8")
-                except Exception as e:
-                    error_str = str(e)
-                    log_info(f"CUDA load failed: {error_str}")
-                    
-                    if "cublas" in error_str.lower() or "cudnn" in error_str.lower():
-                         log_info("Missing CUDA/cuDNN libraries. Please install cuDNN 8.x for CUDA 11/12.")
-                    
-                    log_info("Falling back to CPU...")
-                    model = WhisperModel(model_path, device="cpu", compute_type="int8")
-            elif requested_device == "auto":
-                 # 自动尝试
-                 try:
-                    model = WhisperModel(model_path, device="auto", compute_type="int8")
-                 except Exception as e:
-                    log_info(f"Auto device failed ({e}), falling back to CPU")
-                    model = WhisperModel(model_path, device="cpu", compute_type="int8")
-            else:
-                 # 默认 CPU
-                 model = WhisperModel(model_path, device="cpu", compute_type="int8")
-             
-        except Exception as e_cpu:
-             log_info(f"'cpu' device failed ({e_cpu}), trying auto")
-             model = WhisperModel(model_path, device="auto", compute_type="int8")
-             
-        log_info("Model loaded successfully")
-    except Exception as e:
-        print(json.dumps({"error": f"Failed to load model: {str(e)}"}, ensure_ascii=False))
-        sys.exit(1)
-
-    log_info("Starting transcription...")
-    ipc_send("progress", {"stage": "transcribing"})
-    
     # Use initial_prompt to guide the model to output Simplified Chinese
     initial_prompt = None
     if args.language in ["auto", "zh"]:
@@ -353,53 +556,116 @@ def main():
         transcribe_input = temp_wav
         log_info(f"Audio converted to {temp_wav} (Size: {os.path.getsize(temp_wav)} bytes)")
 
+    # 查找音频指纹索引，复用重复素材（不同转码/剪辑版本）已有的字幕段
+    fingerprint = None
+    reuse = None
+    if args.reuse_audio and temp_wav:
+        try:
+            pcm = audio_index.load_pcm(temp_wav)
+            fingerprint = audio_index.compute_fingerprint(pcm)
+            if args.word_timestamps:
+                # 索引中没有词级时间戳，复用段无法按字数/时长限制重新切分，只更新索引
+                log_info("Word timestamps requested, not reusing indexed segments")
+            else:
+                reuse = audio_index.find_match(pcm, args.model_id, args.language, fingerprint)
+        except Exception as e:
+            log_info(f"Audio index lookup failed: {e}")
+            reuse = None
+        if reuse:
+            log_info(f"Reusing {reuse['reused_seconds']:.1f}s of segments from {reuse['source']}, decoding {len(reuse['novel_spans'])} novel span(s)")
+            ipc_send("progress", {
+                "stage": "reusing",
+                "source": reuse["source"],
+                "reused_seconds": reuse["reused_seconds"],
+                "novel_spans": reuse["novel_spans"]
+            })
+            transcribe_input = pcm
+            # 复用段已是最终结果，不再跑草稿
+            if preview_model_id:
+                preview_model_id = None
+                model_path = ensure_model_path(args.model_id)
+
+    # 加载模型（完全复用时无需解码，跳过加载）
+    model = None
+    if not reuse or reuse["novel_spans"]:
+        log_info("Loading model...")
+        ipc_send("progress", {"stage": "loading_model"})
+        
+        try:
+            model = load_whisper_model(model_path, args.device)
+            log_info("Model loaded successfully")
+        except Exception as e:
+            print(json.dumps({"error": f"Failed to load model: {str(e)}"}, ensure_ascii=False))
+            sys.exit(1)
+
+    log_info("Starting transcription...")
+    ipc_send("progress", {"stage": "transcribing"})
+
+
+    word_table = subtitle_segmenter.WordTable() if args.word_timestamps else None
 
     try:
-        segments_generator, info = model.transcribe(
-            transcribe_input, 
-            language=None if args.language == "auto" else args.language,
-            beam_size=5,
-            best_of=5,
-            vad_filter=False, 
-            temperature=[0.0, 0.2, 0.4, 0.6, 0.8, 1.0], 
-            condition_on_previous_text=False, 
-            initial_prompt=initial_prompt
-        )
-        
-        detected_lang = info.language
-        cc = None
-        if detected_lang == "zh":
-             try:
-                 cc = opencc.OpenCC('t2s')
-             except Exception as e:
-                 log_info(f"OpenCC init failed: {e}")
+        if preview_model_id:
+            # 第一遍：小模型快速草稿
+            info, segments_iter = transcribe_segments(
+                model, transcribe_input, args.language, initial_prompt, duration, draft=True
+            )
+            draft_segments = []
+            for seg_data, progress in segments_iter:
+                draft_segments.append(seg_data)
+                ipc_send("segment", {
+                    "segment": seg_data,
+                    "progress": progress
+                })
+            ipc_send("draft_complete", {
+                "segments": draft_segments,
+                "language": info.language,
+                "model_id": preview_model_id
+            })
 
-        # 实时收集结果
-        segments_result = []
-        
-        for segment in segments_generator:
-            # 发送进度
-            progress = 0.0
-            if duration and duration > 0:
-                progress = min(segment.end / duration, 1.0)
-            
-            text = segment.text
-            if cc:
-                text = cc.convert(text)
-
-            seg_data = {
-                "id": segment.id,
-                "start": segment.start,
-                "end": segment.end,
-                "text": text
-            }
-            segments_result.append(seg_data)
+            # 第二遍：大模型复用已提取的音频精修，逐段替换草稿
+            del model
+            model_path = ensure_model_path(args.model_id)
+            log_info(f"Loading refine model {args.model_id}...")
+            ipc_send("progress", {"stage": "loading_model", "model": args.model_id})
+            model = load_whisper_model(model_path, args.device)
+            ipc_send("progress", {"stage": "refining", "model": args.model_id})
+
+            info, segments_iter = transcribe_segments(
+                model, transcribe_input, args.language, initial_prompt, duration, words=word_table
+            )
+            pending_drafts = collections.deque(draft_segments)
+            segments_result = []
+            for seg_data, progress in segments_iter:
+                segments_result.append(seg_data)
+                ipc_send("segment_update", {
+                    "segment": seg_data,
+                    "replaces": pop_replaced_drafts(pending_drafts, seg_data["end"]),
+                    "progress": progress
+                })
+            if pending_drafts:
+                # 精修结果未覆盖的尾部草稿（通常是幻觉或静音段）直接移除
+                ipc_send("segment_update", {
+                    "segment": None,
+                    "replaces": [d["id"] for d in pending_drafts],
+                    "progress": 1.0
+                })
+        else:
+            info, segments_iter = transcribe_segments(
+                model, transcribe_input, args.language, initial_prompt, duration, reuse=reuse, words=word_table
+            )
+
+            # 实时收集结果
+            segments_result = []
             
-            # Send structured segment update
-            ipc_send("segment", {
-                "segment": seg_data,
-                "progress": progress
-            })
+            for seg_data, progress in segments_iter:
+                segments_result.append(seg_data)
+                
+                # Send structured segment update
+                ipc_send("segment", {
+                    "segment": seg_data,
+                    "progress": progress
+                })
 
         # 最终输出完整结果
         final_output = {
@@ -409,10 +675,35 @@ def main():
             "duration": info.duration,
             "model_id": args.model_id
         }
+        if preview_model_id:
+            final_output["draft_model_id"] = preview_model_id
+        if reuse:
+            final_output["reused_from"] = reuse["source"]
+        if word_table is not None:
+            # 按字数/时长/语速限制重新切分字幕，原始识别段保留在 source_segments
+            limits = subtitle_segmenter.get_limits(info.language, args.max_chars, args.max_duration, args.max_cps)
+            subtitles = subtitle_segmenter.resegment(word_table, **limits)
+            if preview_model_id:
+                # 草稿模式下编辑器已在精修段上编辑，不替换 segments，切分结果单独放在 subtitles
+                final_output["subtitles"] = subtitles
+            else:
+                final_output["segments"] = subtitles
+                final_output["source_segments"] = segments_result
+            final_output["subtitle_limits"] = limits
+            final_output["words"] = word_table.encode()
         
         # Send final result (not wrapped in "payload" to keep backward compat or just use a type?)
         # Let's use the new IPC format for everything.
         ipc_send("complete", final_output)
+
+        if fingerprint is not None:
+            try:
+                audio_index.add_entry(
+                    *fingerprint, segments_result, info.language, info.language_probability,
+                    args.input, args.model_id, args.language
+                )
+            except Exception as e:
+                log_info(f"Failed to update audio index: {e}")
         
     except Exception as e:
         print(json.dumps({"error": f"Transcription failed: {str(e)}"}, ensure_ascii=False))
@@ -1,9 +1,12 @@
 const { app, BrowserWindow, ipcMain, dialog, shell } = require('electron');
 const path = require('path');
 const { spawn } = require('child_process');
+const fs = require('fs');
 
 let mainWindow;
 let pythonProcess = null;
+// Backend process that pre-loads a model and waits for the first job on stdin
+let warmup = null;
 
 // 定义路径
 const isDev = !app.isPackaged;
@@ -39,6 +42,7 @@ app.whenReady().then(() => {
 });
 
 app.on('window-all-closed', function () {
+  stopWarmup();
   if (process.platform !== 'darwin') app.quit();
 });
 
@@ -184,6 +188,10 @@ ipcMain.handle('delete-model', async (event, modelId) => {
     if (pythonProcess) {
         return { success: false, message: 'Cannot delete model while a task is running' };
     }
+    // 预热进程会占用模型文件
+    if (warmup && warmup.modelId === modelId) {
+        stopWarmup();
+    }
 
     const modelsRoot = path.join(path.dirname(scriptPath), 'models');
     const modelsDir = path.join(modelsRoot, modelId);
@@ -201,12 +209,102 @@ ipcMain.handle('delete-model', async (event, modelId) => {
     }
 });
 
-ipcMain.handle('start-transcription', (event, { inputPath, modelId, language, useGpu }) => {
+function stopWarmup() {
+  if (warmup) {
+    warmup.process.kill();
+    warmup = null;
+  }
+}
+
+// Hand the warm process over to a job if it holds the model the job loads first
+function takeWarmup(modelId, device) {
+  if (!warmup) return null;
+  const current = warmup;
+  warmup = null;
+  const usable = current.process.exitCode === null && current.state !== 'error' && current.state !== 'skipped';
+  if (!usable || current.modelId !== modelId || current.device !== device) {
+    current.process.kill();
+    return null;
+  }
+  current.process.stdout.removeAllListeners('data');
+  current.process.stderr.removeAllListeners('data');
+  current.process.removeAllListeners('close');
+  return current.process;
+}
+
+ipcMain.handle('warmup-model', (event, { modelId, useGpu }) => {
+  const device = useGpu ? 'cuda' : 'cpu';
+  if (pythonProcess) {
+    return { success: false, message: 'A task is already running' };
+  }
+  if (warmup && warmup.modelId === modelId && warmup.device === device) {
+    return { success: true, state: warmup.state };
+  }
+  stopWarmup();
+
+  const args = [scriptPath, '--warmup', '--model-id', modelId, '--device', device];
+  console.log('Spawning warmup:', pythonPath, args.join(' '));
+  const env = { ...process.env, HF_ENDPOINT: 'https://hf-mirror.com' };
+  const current = { process: spawn(pythonPath, args, { env }), modelId, device, state: 'starting' };
+  warmup = current;
+
+  let stdoutBuffer = '';
+  current.process.stdout.on('data', (data) => {
+    stdoutBuffer += data.toString();
+    const lines = stdoutBuffer.split('\n');
+    stdoutBuffer = lines.pop();
+
+    for (const line of lines) {
+      const trimmed = line.trim();
+      if (!trimmed) continue;
+      try {
+        const message = JSON.parse(trimmed);
+        if (message.type === 'warmup') {
+          // payload: { state: 'paging' | 'loading' | 'decoding' | 'ready' | 'skipped' | 'error', model_id, ...timings }
+          current.state = message.payload.state;
+          if (mainWindow && !mainWindow.isDestroyed()) {
+            mainWindow.webContents.send('model-warmup', message.payload);
+          }
+        }
+      } catch (e) {
+        console.error('Failed to parse warmup JSON line:', trimmed, e);
+      }
+    }
+  });
+
+  current.process.stderr.on('data', (data) => {
+    console.error('Warmup stderr:', data.toString());
+  });
+
+  current.process.on('close', (code) => {
+    console.log(`Warmup process exited with code ${code}`);
+    if (warmup === current) {
+      warmup = null;
+    }
+  });
+
+  return { success: true, state: current.state };
+});
+
+ipcMain.handle('start-transcription', (event, { inputPath, modelId, previewModelId, reuseAudio, wordTimestamps, subtitleLimits, language, useGpu }) => {
   if (pythonProcess) {
     return { error: 'A task is already running' };
   }
 
   const args = [scriptPath, '--input', inputPath, '--model-id', modelId];
+  if (previewModelId && previewModelId !== modelId) {
+    args.push('--preview-model-id', previewModelId);
+  }
+  if (reuseAudio) {
+    args.push('--reuse-audio');
+  }
+  if (wordTimestamps) {
+    args.push('--word-timestamps');
+    const limits = subtitleLimits || {};
+    if (limits.maxChars) args.push('--max-chars', String(limits.maxChars));
+    if (limits.maxDuration) args.push('--max-duration', String(limits.maxDuration));
+    if (limits.maxCps) args.push('--max-cps', String(limits.maxCps));
+  }
   if (language) {
     args.push('--language', language);
   }
@@ -217,10 +315,19 @@ ipcMain.handle('start-transcription', (event, { inputPath, modelId, language, us
     args.push('--device', 'cpu');
   }
 
-  console.log('Spawning:', pythonPath, args.join(' '));
-  
-  const env = { ...process.env, HF_ENDPOINT: 'https://hf-mirror.com' };
-  pythonProcess = spawn(pythonPath, args, { env });
+  // The first model loaded is the draft model in preview mode
+  const firstModelId = (previewModelId && previewModelId !== modelId) ? previewModelId : modelId;
+  const warmProcess = takeWarmup(firstModelId, useGpu ? 'cuda' : 'cpu');
+  if (warmProcess) {
+    console.log('Handing job to warm process:', args.join(' '));
+    pythonProcess = warmProcess;
+    pythonProcess.stdin.write(JSON.stringify(args.slice(1)) + '\n');
+  } else {
+    console.log('Spawning:', pythonPath, args.join(' '));
+    
+    const env = { ...process.env, HF_ENDPOINT: 'https://hf-mirror.com' };
+    pythonProcess = spawn(pythonPath, args, { env });
+  }
 
   // State to track if we already received a successful result
   let hasCompleted = false;
@@ -264,6 +371,10 @@ ipcMain.handle('start-transcription', (event, { inputPath, modelId, language, us
                          mainWindow.webContents.send('transcription-progress', { type: 'LOAD_MODEL' });
                     } else if (stage === 'transcribing') {
                          mainWindow.webContents.send('transcription-progress', { type: 'TRANSCRIBE', value: 0 });
+                    } else if (stage === 'reusing') {
+                         mainWindow.webContents.send('transcription-progress', { type: 'REUSE', value: message.payload.reused_seconds, source: message.payload.source });
+                    } else if (stage === 'refining') {
+                         mainWindow.webContents.send('transcription-progress', { type: 'REFINE', value: 0, modelId: message.payload.model });
                     }
                     break;
                 
@@ -272,7 +383,10 @@ ipcMain.handle('start-transcription', (event, { inputPath, modelId, language, us
                     const seg = message.payload.segment;
                     const prog = message.payload.progress;
                     
-                    accumulatedSegments.push(seg);
+                    // Draft segments are never kept for crash recovery; only refined ones are
+                    if (!seg.draft) {
+                        accumulatedSegments.push(seg);
+                    }
                     
                     // Update progress bar
                     mainWindow.webContents.send('transcription-progress', { type: 'TRANSCRIBE', value: prog });
@@ -282,6 +396,20 @@ ipcMain.handle('start-transcription', (event, { inputPath, modelId, language, us
                     mainWindow.webContents.send('transcription-progress', { type: 'DETAILS', value: safeText });
                     break;
 
+                case 'draft_complete':
+                    // payload: { segments: [], language, model_id }
+                    mainWindow.webContents.send('transcription-draft', message.payload);
+                    break;
+
+                case 'segment_update':
+                    // payload: { segment: {...} | null, replaces: [draftId, ...], progress: 0.5 }
+                    if (message.payload.segment) {
+                        accumulatedSegments.push(message.payload.segment);
+                    }
+                    mainWindow.webContents.send('transcription-segment-update', message.payload);
+                    mainWindow.webContents.send('transcription-progress', { type: 'REFINE', value: message.payload.progress });
+                    break;
+
                 case 'complete':
                     // payload: { segments: [], ... }
                     const result = message.payload;
@@ -5,6 +5,7 @@ contextBridge.exposeInMainWorld('electronAPI', {
   getModels: () => ipcRenderer.invoke('get-models'),
   downloadModel: (modelId) => ipcRenderer.invoke('download-model', modelId),
   deleteModel: (modelId) => ipcRenderer.invoke('delete-model', modelId),
+  warmupModel: (options) => ipcRenderer.invoke('warmup-model', options),
   startTranscription: (options) => ipcRenderer.invoke('start-transcription', options),
   cancelTranscription: () => ipcRenderer.invoke('cancel-transcription'),
   showItemInFolder: (path) => ipcRenderer.invoke('show-item-in-folder', path),
@@ -12,11 +13,17 @@ contextBridge.exposeInMainWorld('electronAPI', {
   onProgress: (callback) => ipcRenderer.on('transcription-progress', (event, value) => callback(value)),
   onComplete: (callback) => ipcRenderer.on('transcription-complete', (_event, value) => callback(value)),
   onError: (callback) => ipcRenderer.on('transcription-error', (_event, value) => callback(value)),
+  onDraft: (callback) => ipcRenderer.on('transcription-draft', (_event, value) => callback(value)),
+  onSegmentUpdate: (callback) => ipcRenderer.on('transcription-segment-update', (_event, value) => callback(value)),
+  onWarmup: (callback) => ipcRenderer.on('model-warmup', (_event, value) => callback(value)),
   
   // 清理监听器
   removeAllListeners: () => {
     ipcRenderer.removeAllListeners('transcription-progress');
     ipcRenderer.removeAllListeners('transcription-complete');
     ipcRenderer.removeAllListeners('transcription-error');
+    ipcRenderer.removeAllListeners('transcription-draft');
+    ipcRenderer.removeAllListeners('transcription-segment-update');
+    ipcRenderer.removeAllListeners('model-warmup');
   }
 });
@@ -5,8 +5,15 @@ const selectFileBtn = document.getElementById('select-file-btn');
 const fileListContainer = document.getElementById('file-list');
 const clearListBtn = document.getElementById('clear-list-btn');
 const modelSelect = document.getElementById('model-select');
+const previewModelSelect = document.getElementById('preview-model-select');
 const languageSelect = document.getElementById('language-select');
 const useGpuCheckbox = document.getElementById('use-gpu');
+const reuseAudioCheckbox = document.getElementById('reuse-audio');
+const wordTimestampsCheckbox = document.getElementById('word-timestamps');
+const subtitleLimits = document.getElementById('subtitle-limits');
+const maxCharsInput = document.getElementById('max-chars');
+const maxDurationInput = document.getElementById('max-duration');
+const maxCpsInput = document.getElementById('max-cps');
 const startBtn = document.getElementById('start-btn');
 const cancelBtn = document.getElementById('cancel-btn');
 const openFolderContainer = document.getElementById('open-folder-container');
@@ -30,12 +37,27 @@ let isTranscribing = false;
 let transcriptionStartTime = 0;
 let currentSegments = [];
 let originalSegments = [];
+let segmentsEdited = false;
 let downloadButtons = new Map();
 
 // --- Initialization ---
 async function init() {
     await loadModels();
     updateFileUI();
+    warmupSelectedModel();
+}
+
+// Load the model the next job will use in a background backend process while files are being chosen
+async function warmupSelectedModel() {
+    if (isTranscribing) return;
+    const modelId = previewModelSelect.value || modelSelect.value;
+    const model = models.find(m => m.id === modelId);
+    if (!model || !model.installed) return;
+    try {
+        await window.electronAPI.warmupModel({ modelId, useGpu: useGpuCheckbox.checked });
+    } catch (err) {
+        console.error("Warm-up failed:", err);
+    }
 }
 
 async function loadModels() {
@@ -70,7 +92,21 @@ function updateModelUI() {
         if (firstInstalled) modelSelect.value = firstInstalled.id;
     }
 
-    // 2. Update Modal List
+    // 2. Update Draft Preview Dropdown (small models only)
+    const currentPreview = previewModelSelect.value;
+    previewModelSelect.innerHTML = '<option value="">Off</option>';
+    models.filter(m => m.preview).forEach(m => {
+        const option = document.createElement('option');
+        option.value = m.id;
+        const status = m.installed ? '✅' : '☁️';
+        option.text = `${status} ${m.name}`;
+        previewModelSelect.appendChild(option);
+    });
+    if (models.some(m => m.preview && m.id === currentPreview)) {
+        previewModelSelect.value = currentPreview;
+    }
+
+    // 3. Update Modal List
     renderModelList();
 }
 
@@ -141,6 +177,7 @@ async function downloadModel(modelId, btn) {
         btn.disabled = false;
     } finally {
         await loadModels();
+        warmupSelectedModel();
     }
 }
 
@@ -154,6 +191,7 @@ async function deleteModel(modelId, btn) {
             alert('Delete failed: ' + (result.message || 'Unknown error'));
         }
         await loadModels();
+        warmupSelectedModel();
     } catch (err) {
         alert('Delete failed: ' + err.message);
         btn.innerText = originalText;
@@ -275,6 +313,19 @@ selectFileBtn.addEventListener('click', async () => {
 
 clearListBtn.addEventListener('click', clearFiles);
 
+modelSelect.addEventListener('change', warmupSelectedModel);
+previewModelSelect.addEventListener('change', warmupSelectedModel);
+useGpuCheckbox.addEventListener('change', warmupSelectedModel);
+
+wordTimestampsCheckbox.addEventListener('change', () => {
+    subtitleLimits.style.display = wordTimestampsCheckbox.checked ? 'flex' : 'none';
+    // Reused segments have no word timestamps and cannot be re-split, so reuse is off in this mode
+    reuseAudioCheckbox.disabled = wordTimestampsCheckbox.checked;
+    reuseAudioCheckbox.parentElement.title = wordTimestampsCheckbox.checked
+        ? 'Not available with Word Timestamps: reused subtitles cannot be re-split'
+        : '';
+});
+
 dropZone.addEventListener('click', (e) => {
     if (e.target === dropZone || e.target.tagName === 'P') {
         selectFileBtn.click();
@@ -357,13 +408,24 @@ async function processNextFile() {
     statusText.innerText = `Processing file ${currentFileIndex + 1}/${fileQueue.length}: ${filePath.split(/[/\\]/).pop()}`;
     speedStats.innerText = '';
     livePreview.innerText = '';
+    livePreview.style.display = 'block';
+    editorContainer.style.display = 'none';
     progressFill.style.width = '0%';
+    segmentsEdited = false;
     
     transcriptionStartTime = Date.now();
     
     window.electronAPI.startTranscription({
         inputPath: filePath,
         modelId: modelSelect.value,
+        previewModelId: previewModelSelect.value,
+        reuseAudio: reuseAudioCheckbox.checked && !wordTimestampsCheckbox.checked,
+        wordTimestamps: wordTimestampsCheckbox.checked,
+        subtitleLimits: {
+            maxChars: parseInt(maxCharsInput.value, 10) || null,
+            maxDuration: parseFloat(maxDurationInput.value) || null,
+            maxCps: parseFloat(maxCpsInput.value) || null
+        },
         language: languageSelect.value,
         useGpu: useGpuCheckbox.checked
     });
@@ -386,6 +448,7 @@ function finishBatch() {
     updateFileUI();
     
     openFolderContainer.style.display = 'block';
+    warmupSelectedModel();
 }
 
 startBtn.addEventListener('click', () => {
@@ -424,6 +487,7 @@ cancelBtn.addEventListener('click', async () => {
         
         progressFill.style.width = '0%';
         updateFileUI();
+        warmupSelectedModel();
     }
 });
 
@@ -434,6 +498,13 @@ window.electronAPI.onProgress((data) => {
         const percent = (parseFloat(data.value) * 100).toFixed(1);
         progressFill.style.width = `${percent}%`;
         statusText.innerText = `Transcribing... ${percent}%`;
+    } else if (data.type === 'REFINE') {
+        const percent = (parseFloat(data.value) * 100).toFixed(1);
+        progressFill.style.width = `${percent}%`;
+        statusText.innerText = `Refining draft... ${percent}%`;
+    } else if (data.type === 'REUSE') {
+        const source = (data.source || '').split(/[/\\]/).pop();
+        statusText.innerText = `Reusing ${parseFloat(data.value).toFixed(0)}s of subtitles from ${source}`;
     } else if (data.type === 'DETAILS') {
         livePreview.innerText += data.value + '\n';
         livePreview.scrollTop = livePreview.scrollHeight;
@@ -464,11 +535,31 @@ window.electronAPI.onProgress((data) => {
     }
 });
 
+window.electronAPI.onWarmup((data) => {
+    if (isTranscribing) return;
+    const model = models.find(m => m.id === data.model_id);
+    const name = model ? model.name : data.model_id;
+    if (data.state === 'ready') {
+        const total = data.page_in_seconds + data.load_seconds + data.decode_seconds;
+        speedStats.innerText = `${name} ready on ${data.device} (warm-up ${total.toFixed(1)}s)`;
+        console.log("Warm-up timings:", data);
+    } else if (data.state === 'error') {
+        speedStats.innerText = '';
+        console.error("Warm-up error:", data.error);
+    } else if (data.state !== 'skipped') {
+        speedStats.innerText = `Warming up ${name}...`;
+    }
+});
+
 window.electronAPI.onComplete((result) => {
     // Save SRT automatically for batch processing
     // Deep copy for original and current
-    originalSegments = JSON.parse(JSON.stringify(result.segments));
-    currentSegments = JSON.parse(JSON.stringify(result.segments));
+    // With draft preview + word timestamps the re-split cues arrive in result.subtitles;
+    // they become the saved SRT while the editor keeps the refined segments (with any user edits)
+    originalSegments = JSON.parse(JSON.stringify(result.subtitles || result.segments));
+    if (!result.draft_model_id) {
+        currentSegments = JSON.parse(JSON.stringify(result.segments));
+    }
     
     // Auto save SRT for current file
     const fileResult = { segments: originalSegments };
@@ -485,6 +576,12 @@ window.electronAPI.onComplete((result) => {
     
     // To keep it simple for now, we will just use the existing saveSRT but maybe we should automate it.
     saveSRT(fileResult, false); 
+
+    // The next file's draft replaces the editor, so save edits made while this file was refining
+    if (segmentsEdited && currentFileIndex + 1 < fileQueue.length) {
+        saveSRT({ segments: currentSegments }, true);
+        segmentsEdited = false;
+    }
     
     progressFill.style.width = '100%';
     
@@ -509,38 +606,79 @@ function renderEditor() {
     editorContainer.innerHTML = '';
 
     currentSegments.forEach((seg) => {
-        const item = document.createElement('div');
-        item.className = 'editor-item';
-        
-        const timeTag = document.createElement('div');
-        timeTag.className = 'time-tag';
-        timeTag.innerText = `[${formatTime(seg.start)} -> ${formatTime(seg.end)}]`;
-        
-        const textArea = document.createElement('textarea');
-        textArea.className = 'text-edit';
-        textArea.value = seg.text;
-        textArea.rows = 1;
-        
-        // Auto resize height
-        const adjustHeight = () => {
-             textArea.style.height = 'auto';
-             textArea.style.height = textArea.scrollHeight + 'px';
-        };
-        
-        // Use timeout to ensure DOM is rendered before calculating height
-        setTimeout(adjustHeight, 0);
-        
-        textArea.addEventListener('input', (e) => {
-            seg.text = e.target.value;
-            adjustHeight();
-        });
-
-        item.appendChild(timeTag);
-        item.appendChild(textArea);
-        editorContainer.appendChild(item);
+        editorContainer.appendChild(createEditorItem(seg));
     });
 }
 
+function createEditorItem(seg) {
+    const item = document.createElement('div');
+    item.className = 'editor-item';
+    if (seg.draft) {
+        item.classList.add('draft');
+    }
+    
+    const timeTag = document.createElement('div');
+    timeTag.className = 'time-tag';
+    timeTag.innerText = `[${formatTime(seg.start)} -> ${formatTime(seg.end)}]`;
+    
+    const textArea = document.createElement('textarea');
+    textArea.className = 'text-edit';
+    textArea.value = seg.text;
+    textArea.rows = 1;
+    
+    // Auto resize height
+    const adjustHeight = () => {
+         textArea.style.height = 'auto';
+         textArea.style.height = textArea.scrollHeight + 'px';
+    };
+    
+    // Use timeout to ensure DOM is rendered before calculating height
+    setTimeout(adjustHeight, 0);
+    
+    textArea.addEventListener('input', (e) => {
+        seg.text = e.target.value;
+        segmentsEdited = true;
+        adjustHeight();
+    });
+
+    item.appendChild(timeTag);
+    item.appendChild(textArea);
+    return item;
+}
+
+// Replace draft segments in place with a refined one.
+// Refined segments arrive in order, so they are always inserted before the first remaining draft.
+function applySegmentUpdate({ segment, replaces }) {
+    let index = currentSegments.findIndex(s => s.draft);
+    if (index === -1) index = currentSegments.length;
+    const replaced = new Set(replaces || []);
+
+    for (let i = currentSegments.length - 1; i >= index; i--) {
+        const seg = currentSegments[i];
+        if (seg.draft && replaced.has(seg.id)) {
+            currentSegments.splice(i, 1);
+            const row = editorContainer.children[i];
+            if (row) row.remove();
+        }
+    }
+
+    if (segment) {
+        currentSegments.splice(index, 0, segment);
+        editorContainer.insertBefore(createEditorItem(segment), editorContainer.children[index] || null);
+    }
+}
+
+window.electronAPI.onDraft((result) => {
+    // Draft is usable right away; refined segments replace it as they arrive
+    currentSegments = JSON.parse(JSON.stringify(result.segments));
+    renderEditor();
+    statusText.innerText = 'Draft ready, refining...';
+});
+
+window.electronAPI.onSegmentUpdate((update) => {
+    applySegmentUpdate(update);
+});
+
 saveEditedBtn.addEventListener('click', () => {
     // Save currentSegments to SRT
     const result = { segments: currentSegments };